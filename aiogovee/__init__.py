@@ -1,3 +1,4 @@
 from .aiogovee import GoveeListener
+from .taskgroup import TaskGroup
 from .message import *
 from .msgtypes import *
\ No newline at end of file
@@ -31,9 +31,11 @@
 
 
 import asyncio as aio
-import random, datetime, socket, ifaddr
+import random, datetime, socket, ipaddress, ifaddr
 from .msgtypes import *
 from .message import govee_message_to_json
+from .transition import TransitionEngine
+from .taskgroup import TaskGroup, MAX_PENDING_TASKS
 
 LISTEN_IP = "0.0.0.0"
 UDP_LISTEN_PORT = 4002
@@ -44,6 +46,36 @@ DEFAULT_TIMEOUT = 0.5  # How long to wait for a response
 DEFAULT_ATTEMPTS = 1  # How many time should we try to send to the device
 DISCOVERY_INTERVAL = 180
 DISCOVERY_STEP = 5
+MAX_MESSAGES_PER_SECOND = 20  # Max num of messages a device can handle
+MAX_DATAGRAM_SIZE = 2048  # Bigger datagrams are not Govee responses
+KNOWN_COMMANDS = (b'"scan"', b'"devStatus"')  # Commands the listener handles
+SOURCE_RATE = 50  # How many datagrams per second are accepted from a single source
+SOURCE_BURST = 100  # How many datagrams a single source can send in a burst
+DEDUPE_WINDOW = 0.2  # Identical datagrams from a source within this many seconds are dropped
+SOURCE_EXPIRY = 60  # How long, in seconds, an idle source is remembered
+SWEEP_RATE = 500  # How many unicast discovery messages are sent per second when sweeping
+SWEEP_BATCH = 25  # How many unicast discovery messages are sent between pauses
+SWEEP_FULL_EVERY = 10  # Every how many discoveries the sweep ranges are probed in full
+SWEEP_MAX_PREFIX = 16  # Biggest range that can be swept, /16 is about 2 minutes at SWEEP_RATE
+SNAPSHOT_TIMEOUT = 1  # How long, in seconds, a snapshot waits for the devices status
+ON_VALUES = [True, 1, "on", "On", "ON"]  # Values turn_onoff accepts to turn a device On
+OFF_VALUES = [False, 0, "off", "Off", "OFF"]  # Values turn_onoff accepts to turn a device Off
+
+
+def parse_sweep_range(cidr):
+    """Parse an address range to sweep
+        :param cidr: The range, e.g. "192.168.4.0/22"
+        :type cidr: str
+        :returns: The network
+        :rtype: ipaddress.IPv4Network
+        :raises ValueError: If the range is not IPv4 or is bigger than /SWEEP_MAX_PREFIX
+    """
+    network = ipaddress.ip_network(cidr, strict=False)
+    if network.version != 4:
+        raise ValueError("Only IPv4 ranges can be swept: {}".format(cidr))
+    if network.prefixlen < SWEEP_MAX_PREFIX:
+        raise ValueError("Range too big to sweep, the biggest is /{}: {}".format(SWEEP_MAX_PREFIX, cidr))
+    return network
 
 
 class Device(aio.DatagramProtocol):
@@ -58,12 +90,15 @@ class Device(aio.DatagramProtocol):
     :type port: into
     :param parent: Parent object with register/unregister methods
     :type parent: object
+    :param tasks: Task group running the messages sent in the background, a new one if None
+    :type tasks: aiogovee.TaskGroup
     :returns: an asyncio DatagramProtocol to handle communication with the device
     :rtype: DatagramProtocol
     """
 
-    def __init__(self, loop, deviceId, sku, ip_addr, parent=None):
+    def __init__(self, loop, deviceId, sku, ip_addr, parent=None, tasks=None):
         self.loop = loop
+        self.tasks = tasks if tasks is not None else TaskGroup(loop)
         self.deviceId = deviceId
         self.sku = sku
         self.ip_addr = ip_addr
@@ -71,6 +106,7 @@ class Device(aio.DatagramProtocol):
         self.registered = False
         self.retry_count = DEFAULT_ATTEMPTS
         self.timeout = DEFAULT_TIMEOUT
+        self.max_msg_rate = MAX_MESSAGES_PER_SECOND
         self.unregister_timeout = DEFAULT_TIMEOUT
         self.transport = None
         self.task = None
@@ -84,6 +120,11 @@ class Device(aio.DatagramProtocol):
         self.rgbColor = None
         self.colorTemInKelvin = None
         self.lastmsg = datetime.datetime.now()
+        # State cache
+        self.status_time = None  # Loop time of the last devStatus response
+        self.query_time = None  # Loop time of the last devStatus query
+        self.pending = {}  # Optimistic values not confirmed yet, (value, loop time) indexed by attribute
+        self.status_waiters = []  # Futures waiting for the next devStatus response
 
 
     #
@@ -104,6 +145,12 @@ class Device(aio.DatagramProtocol):
                 self.parent.register(self)
 
 
+    def status_changed(self):
+        """Proxy method to tell the parent the device status changed, if it wants to know."""
+        if self.parent and hasattr(self.parent, "status_changed"):
+            self.parent.status_changed(self)
+
+
     def unregister(self):
         """Proxy method to unregister the device with the parent."""
         if self.registered:
@@ -126,12 +173,27 @@ class Device(aio.DatagramProtocol):
         if self.task:
             self.task.cancel()
             self.task = None
+        self.tasks.cancel(self)
 
 
     #
     #                            Workflow Methods
     #
 
+    def send(self, msg):
+        """Method used to send a message to the device right away, only once.
+        :param msg: The message to send
+        :type msg: aiogovee.Message
+        :returns: True if the message was handed to the transport
+        :rtype: bool
+        """
+        if self.transport:
+            payload = govee_message_to_json(msg).encode('utf-8')
+            self.transport.sendto(payload)
+            return True
+        return False
+
+
     async def try_sending(self, msg, num_repeats):
         """Coroutine used to send message to the device when no response is needed.
         :param msg: Message to send
@@ -143,15 +205,13 @@ class Device(aio.DatagramProtocol):
         if num_repeats is None:
             num_repeats = self.retry_count
         sent_msg_count = 0
-        sleep_interval = 0.05
+        sleep_interval = 1 / self.max_msg_rate
         while sent_msg_count < num_repeats:
-            if self.transport:
-                payload = govee_message_to_json(msg).encode('utf-8')
-                self.transport.sendto(payload)
+            self.send(msg)
             sent_msg_count += 1
             await aio.sleep(
                 sleep_interval
-            )  # Max num of messages device can handle is 20 per second.
+            )  # Don't exceed the num of messages the device can handle per second.
 
 
     #  Don't wait for Responses, just send the same message repeatedly as fast as possible
@@ -163,11 +223,25 @@ class Device(aio.DatagramProtocol):
         :type msg: aiogovee.Message
         :param num_repeats: Number of times the message is to be sent.
         :type num_repeats: int
-        :returns: Always True
+        :returns: True, False if too many messages are already being sent
         :rtype: bool
         """
-        xx = self.loop.create_task(self.try_sending(msg, num_repeats))
-        return True
+        return self.tasks.spawn(self.try_sending(msg, num_repeats), self) is not None
+
+
+    async def send_when_ready(
+        self, msg, num_repeats=None
+    ):
+        """Coroutine used to send message to the device, waiting for room if too many
+        messages are already being sent.
+        :param msg: The message to send
+        :type msg: aiogovee.Message
+        :param num_repeats: Number of times the message is to be sent.
+        :type num_repeats: int
+        :returns: The task sending the message
+        :rtype: asyncio.Task
+        """
+        return await self.tasks.submit(self.try_sending(msg, num_repeats), self)
 
 
     #
@@ -184,11 +258,82 @@ class Device(aio.DatagramProtocol):
 
 
     def resp_devstatus(self, response):
-        """Default callback for get_status"""
-        self.onOff = response.onOff
-        self.brightness = response.brightness
-        self.rgbColor = response.rgbColor
-        self.colorTemInKelvin = response.colorTemInKelvin
+        """Default callback for get_status
+        The response confirms or reverts pending optimistic values, unless it answers
+        a query sent before the value was written.
+        """
+        self.status_time = self.loop.time()
+        self.lastmsg = datetime.datetime.now()
+        previous = self.status()
+        for attr in ("onOff", "brightness", "rgbColor", "colorTemInKelvin"):
+            if attr in self.pending:
+                if self.query_time is not None and self.pending[attr][1] > self.query_time:
+                    continue
+                del self.pending[attr]
+            setattr(self, attr, getattr(response, attr))
+        if self.status() != previous:
+            self.status_changed()
+        waiters, self.status_waiters = self.status_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+    def next_status(self):
+        """Future done when the next devStatus response is received
+            :returns: The future
+            :rtype: asyncio.Future
+        """
+        waiter = self.loop.create_future()
+        self.status_waiters.append(waiter)
+        return waiter
+
+
+    def optimistic_update(self, **state):
+        """Update the cached state with values just sent to the device
+        They are kept as pending until a devStatus response confirms or reverts them.
+            :param state: New values of onOff, brightness, rgbColor and/or colorTemInKelvin
+            :type state: dict
+        """
+        now = self.loop.time()
+        for attr, value in state.items():
+            setattr(self, attr, value)
+            self.pending[attr] = (value, now)
+
+
+    def status(self, max_age=None):
+        """Return the cached state of the device, without waiting for the network.
+        If the cached state is older than max_age seconds (or was never received),
+        a single devStatus query is sent in the background to refresh it.
+            :param max_age: How old, in seconds, the cached state can be. None to accept any age
+            :type max_age: float
+            :returns: onOff, brightness, rgbColor and colorTemInKelvin
+            :rtype: dict
+        """
+        if max_age is not None and (
+            self.status_time is None or self.loop.time() - self.status_time > max_age
+        ):
+            self.refresh()
+        return {
+            "onOff": self.onOff,
+            "brightness": self.brightness,
+            "rgbColor": self.rgbColor,
+            "colorTemInKelvin": self.colorTemInKelvin,
+        }
+
+
+    def refresh(self):
+        """Send a devStatus query, unless one is already waiting for its response
+            :returns: True if a query was sent
+            :rtype: bool
+        """
+        if (
+            self.query_time is not None
+            and (self.status_time is None or self.status_time < self.query_time)
+            and self.loop.time() - self.query_time < self.timeout
+        ):
+            return False
+        return self.get_devstatus()
 
 
     def turn_onoff(self, onOff):
@@ -196,28 +341,35 @@ class Device(aio.DatagramProtocol):
         This method will send a turn message to the device.
             :param value: The new state
             :type value: str/bool/int
-            :returns: None
-            :rtype: None
+            :returns: True, False if too many messages are already being sent
+            :rtype: bool
+            :raises ValueError: If value is not in ON_VALUES or OFF_VALUES
         """
-        on = [True, 1, "on", "On", "ON"]
-        off = [False, 0, "off", "OFF"]
-        if onOff in on:
+        if onOff in ON_VALUES:
             msg = OnOffControl(1)
-        elif onOff in off:
+        elif onOff in OFF_VALUES:
             msg = OnOffControl(0)
+        else:
+            raise ValueError("Not an On/Off value: {}".format(onOff))
 
         response = self.send_and_forget(msg)
+        if response:
+            self.optimistic_update(onOff=str_onoff(msg.data["value"]))
+        return response
 
 
     def get_devstatus(self):
         """Convenience method to refresh a device status
         This method will send a devStatus query to the device.
-            :returns: None
-            :rtype: None
+            :returns: True, False if too many messages are already being sent
+            :rtype: bool
         """
         msg = DeviceStatusQuery()
 
         response = self.send_and_forget(msg)
+        if response:
+            self.query_time = self.loop.time()
+        return response
 
 
     def set_brightness(self, brightness):
@@ -225,12 +377,15 @@ class Device(aio.DatagramProtocol):
         This method will send a brightness message to the device.
             :param value: The new brightness
             :type value: int 0-100
-            :returns: None
-            :rtype: None
+            :returns: True, False if too many messages are already being sent
+            :rtype: bool
         """
         msg = LightBrightness(brightness)
 
         response = self.send_and_forget(msg)
+        if response:
+            self.optimistic_update(brightness=brightness)
+        return response
 
 
     def set_rgbColor(self, rgbColor):
@@ -238,12 +393,15 @@ class Device(aio.DatagramProtocol):
         This method will send a brightness message to the device.
             :param value: The new brightness
             :type value: int 0-100
-            :returns: None
-            :rtype: None
+            :returns: True, False if too many messages are already being sent
+            :rtype: bool
         """
         msg = ColorColorTemperature(rgbColor, 0)
 
         response = self.send_and_forget(msg)
+        if response:
+            self.optimistic_update(rgbColor=rgbColor, colorTemInKelvin=0)
+        return response
 
 
     def set_colorTemperature(self, colorTemInKelvin):
@@ -251,14 +409,17 @@ class Device(aio.DatagramProtocol):
         This method will send a brightness message to the device.
             :param value: The new brightness
             :type value: int 0-100
-            :returns: None
-            :rtype: None
+            :returns: True, False if too many messages are already being sent
+            :rtype: bool
         """
 
         rgbColor = {'r': 0, 'g': 0, 'b': 0}
         msg = ColorColorTemperature(rgbColor, colorTemInKelvin)
 
         response = self.send_and_forget(msg)
+        if response:
+            self.optimistic_update(colorTemInKelvin=colorTemInKelvin, rgbColor=rgbColor)
+        return response
 
 
 class GoveeListener(aio.DatagramProtocol):
@@ -277,6 +438,12 @@ class GoveeListener(aio.DatagramProtocol):
         :type discovery_interval: int
         :param discovery_step: How often, in seconds, will the discovery process check if it is time to broadcast
         :type discovery_step: int
+        :param max_pending_sends: How many messages can be sent in the background at once, over all devices
+        :type max_pending_sends: int
+        :param sweep_ranges: Address ranges (e.g. "192.168.4.0/22") to also sweep with unicast discovery
+            messages, for networks that block multicast. ValueError is raised if one is not a valid
+            IPv4 range of at most /SWEEP_MAX_PREFIX
+        :type sweep_ranges: list of str
         :returns: an asyncio DatagramProtocol to handle communication with the device
         :rtype: DatagramProtocol
     """
@@ -292,6 +459,8 @@ class GoveeListener(aio.DatagramProtocol):
         broadcast_ip=UDP_BROADCAST_IP,
         broadcast_port=UDP_BROADCAST_PORT,
         devicecontrol_port=UDP_DEVICECONTROL_PORT,
+        max_pending_sends=MAX_PENDING_TASKS,
+        sweep_ranges=None,
     ):
         self.devices = {}  # Known devices indexed by deviceId
         self.devicesByIP = {}  # Known deviceId's indexed by IP Address
@@ -308,6 +477,21 @@ class GoveeListener(aio.DatagramProtocol):
         self.broadcast_ip = broadcast_ip
         self.broadcast_port = broadcast_port
         self.devicecontrol_port = devicecontrol_port
+        self.transitions = TransitionEngine(loop)
+        self.tasks = TaskGroup(loop, max_pending_sends)  # Shared by all the devices
+        self.sources = {}  # [tokens, last datagram, last datagram time, last accepted time] indexed by source IP Address
+        self.dropped = {
+            "oversize": 0,
+            "unknown": 0,
+            "rate_limited": 0,
+            "duplicate": 0,
+            "malformed": 0,
+        }  # Count of dropped datagrams by reason
+        self.sweep_ranges = [parse_sweep_range(x) for x in sweep_ranges or []]
+        self.swept = set()  # Networks that were probed in full
+        self.freed_ips = set()  # IP Addresses left by devices that moved
+        self.sweep_count = 0
+        self.sweep_task = None
 
     def start(self):
         """Start discovery task."""
@@ -339,7 +523,14 @@ class GoveeListener(aio.DatagramProtocol):
             :type addr: tuple
         """
 
-        response = datagram_to_govee_message(data)
+        if not self.accept_datagram(data, addr):
+            return
+
+        try:
+            response = datagram_to_govee_message(data)
+        except (ValueError, KeyError, TypeError, RecursionError):
+            self.dropped["malformed"] += 1
+            return
         dev_ip_addr = addr[0]
 
         # If the message received is a Discovery Response
@@ -353,6 +544,10 @@ class GoveeListener(aio.DatagramProtocol):
                 # rediscovered
                 device = self.devices[deviceId]
 
+                if device.ip != dev_ip_addr and self.devicesByIP.get(device.ip) == deviceId:
+                    # moved
+                    del self.devicesByIP[device.ip]
+                    self.freed_ips.add(device.ip)
                 device.resp_discovery(response)
                 
                 # nothing else to do
@@ -363,7 +558,7 @@ class GoveeListener(aio.DatagramProtocol):
             else:
 
                 # newly discovered
-                device = Device(self.loop, deviceId, sku, dev_ip_addr, parent=self)
+                device = Device(self.loop, deviceId, sku, dev_ip_addr, parent=self, tasks=self.tasks)
                 device.resp_discovery(response)
                 self.devices[deviceId] = device
 
@@ -375,15 +570,75 @@ class GoveeListener(aio.DatagramProtocol):
 
         # If the message received is a Device Status reponse, finds the devive who sent the response by its IP address an processes it
         elif (type(response) == DeviceStatusResponse):
-            deviceId = self.devicesByIP[dev_ip_addr]
+            deviceId = self.devicesByIP.get(dev_ip_addr)
+            if deviceId not in self.devices:
+                self.dropped["unknown"] += 1
+                return
             device = self.devices[deviceId]
 
             device.resp_devstatus(response)
 
         else:
-            print("aborting")
+            self.dropped["unknown"] += 1
             return
 
+    def accept_datagram(self, data, addr):
+        """Cheap checks run before a datagram is decoded
+        Drops datagrams that are too big, don't carry a known command, come from a source
+        sending faster than SOURCE_RATE or repeat the last accepted datagram of their source within
+        DEDUPE_WINDOW seconds. A devStatus response is never a duplicate while its device is waiting
+        for one. Dropped datagrams are counted in self.dropped.
+            :param data: raw data
+            :type data: bytestring
+            :param addr: sender IP address 2-tuple for IPv4, 4-tuple for IPv6
+            :type addr: tuple
+            :returns: True if the datagram should be decoded
+            :rtype: bool
+        """
+        if len(data) > MAX_DATAGRAM_SIZE:
+            self.dropped["oversize"] += 1
+            return False
+        if not any(cmd in data for cmd in KNOWN_COMMANDS):
+            self.dropped["unknown"] += 1
+            return False
+
+        now = self.loop.time()
+        source = self.sources.get(addr[0])
+        if source is None:
+            source = self.sources[addr[0]] = [SOURCE_BURST, None, now, None]
+        else:
+            source[0] = min(SOURCE_BURST, source[0] + (now - source[2]) * SOURCE_RATE)
+        source[2] = now
+        if source[0] < 1:
+            self.dropped["rate_limited"] += 1
+            return False
+        source[0] -= 1
+        if (
+            source[1] == data
+            and now - source[3] < DEDUPE_WINDOW
+            and not (b'"devStatus"' in data and self.waiting_status(addr[0]))
+        ):
+            self.dropped["duplicate"] += 1
+            return False
+        source[1] = data
+        source[3] = now
+        return True
+
+    def waiting_status(self, ip_addr):
+        """Whether the device at ip_addr sent a devStatus query and got no response yet"""
+        device = self.devices.get(self.devicesByIP.get(ip_addr))
+        return (
+            device is not None
+            and device.query_time is not None
+            and (device.status_time is None or device.query_time > device.status_time)
+        )
+
+    def expire_sources(self):
+        """Forget the sources that sent nothing for SOURCE_EXPIRY seconds"""
+        now = self.loop.time()
+        for ip_addr in [x for x, y in self.sources.items() if now - y[2] > SOURCE_EXPIRY]:
+            del self.sources[ip_addr]
+
     def discover(self):
         """Method to send a discovery message"""
         if self.transport:
@@ -392,10 +647,186 @@ class GoveeListener(aio.DatagramProtocol):
                 msg = ScanRequest()
                 payload = govee_message_to_json(msg).encode('utf-8')
                 self.transport.sendto(payload, (self.broadcast_ip, self.broadcast_port))
+                if self.sweep_ranges and (self.sweep_task is None or self.sweep_task.done()):
+                    full = self.sweep_count % SWEEP_FULL_EVERY == 0
+                    self.sweep_count += 1
+                    self.sweep_task = self.tasks.spawn(self.sweep(full=full), self)
             else:
                 self.discovery_countdown -= self.discovery_step
+            self.expire_sources()
             self.loop.call_later(self.discovery_step, self.discover)
 
+    async def sweep(self, cidrs=None, full=False, rate=SWEEP_RATE):
+        """Coroutine sending unicast discovery messages across address ranges
+        For networks that block multicast. The first sweep of a range probes every host in it,
+        later sweeps only probe the known devices and the addresses freed by devices that moved,
+        unless full is True. The responses are processed like any other discovery response.
+            :param cidrs: Address ranges to sweep, self.sweep_ranges if None
+            :type cidrs: list of str
+            :raises ValueError: If a range is not a valid IPv4 range of at most /SWEEP_MAX_PREFIX
+            :param full: Probe every host of the ranges
+            :type full: bool
+            :param rate: How many discovery messages to send per second
+            :type rate: int
+            :returns: The number of discovery messages sent
+            :rtype: int
+        """
+        if cidrs is None:
+            networks = self.sweep_ranges
+        else:
+            networks = [parse_sweep_range(x) for x in cidrs]
+        payload = govee_message_to_json(ScanRequest()).encode('utf-8')
+        sent = 0
+        for network in networks:
+            full_sweep = full or network not in self.swept
+            if full_sweep:
+                targets = (str(x) for x in network.hosts())
+            else:
+                targets = [
+                    x for x in set(self.devicesByIP) | self.freed_ips
+                    if ipaddress.ip_address(x) in network
+                ]
+                self.freed_ips.difference_update(targets)
+            for ip_addr in targets:
+                if not self.transport:
+                    return sent
+                self.transport.sendto(payload, (ip_addr, self.broadcast_port))
+                sent += 1
+                if sent % SWEEP_BATCH == 0:
+                    await aio.sleep(SWEEP_BATCH / rate)
+            if full_sweep:
+                self.swept.add(network)
+        return sent
+
+    def get_devices(self, devices):
+        """Method to turn a list of Devices and/or deviceIds into a list of Devices
+            :param devices: Devices or deviceIds
+            :type devices: list of aiogovee.Device or deviceId
+            :returns: The devices
+            :rtype: list of aiogovee.Device
+            :raises KeyError: If a deviceId is not known
+        """
+        result = []
+        for device in devices:
+            if not isinstance(device, Device):
+                if device not in self.devices:
+                    raise KeyError("Unknown device: {}".format(device))
+                device = self.devices[device]
+            result.append(device)
+        return result
+
+    async def snapshot(self, devices=None, timeout=SNAPSHOT_TIMEOUT):
+        """Coroutine capturing the state of devices into a scene
+        The status of all the devices is queried at once and the scene is built after
+        all of them answered or timeout seconds. Devices that did not answer are in the
+        scene with their cached state if there is one, left out otherwise.
+        The scene can be serialized to JSON, each device is stored as
+        [onOff (1/0), brightness, r, g, b, colorTemInKelvin] indexed by deviceId.
+            :param devices: Devices to capture, all the known devices if None
+            :type devices: list of aiogovee.Device or deviceId
+            :param timeout: How long, in seconds, to wait for the devices status
+            :type timeout: float
+            :returns: The scene
+            :rtype: dict
+            :raises KeyError: If a deviceId is not known
+        """
+        if devices is None:
+            devices = list(self.devices.values())
+        else:
+            devices = self.get_devices(devices)
+        waiters = [device.next_status() for device in devices]
+        for device in devices:
+            device.refresh()
+        if waiters:
+            done, pending = await aio.wait(waiters, timeout=timeout)
+            for waiter in pending:
+                waiter.cancel()
+
+        scene = {}
+        for device in devices:
+            if device.status_time is None or device.onOff not in ("On", "Off"):
+                continue
+            rgbColor = device.rgbColor or {'r': 0, 'g': 0, 'b': 0}
+            scene[device.deviceId] = [
+                1 if device.onOff == "On" else 0,
+                device.brightness,
+                rgbColor['r'],
+                rgbColor['g'],
+                rgbColor['b'],
+                device.colorTemInKelvin or 0,
+            ]
+        return scene
+
+    async def restore(self, scene):
+        """Coroutine bringing devices back to the state captured by snapshot
+        Only the messages needed to go from the cached state of each device to the scene are
+        sent: one per round (on/off, brightness, color) for all the devices at once, with a
+        pause between rounds so no device gets more than its max_msg_rate.
+        Devices that are turned off only get the off message. Running transitions on the
+        restored devices are stopped first.
+            :param scene: A scene returned by snapshot
+            :type scene: dict
+            :returns: The number of messages sent
+            :rtype: int
+        """
+        self.transitions.cancel([self.devices[x] for x in scene if x in self.devices])
+        rounds = [[], [], []]
+        for deviceId, (onOff, brightness, r, g, b, colorTemInKelvin) in scene.items():
+            device = self.devices.get(deviceId)
+            if device is None:
+                continue
+            onOff = ONOFF_MAP[onOff]
+            if device.onOff != onOff:
+                rounds[0].append((device, OnOffControl(1 if onOff == "On" else 0), {"onOff": onOff}))
+            if onOff == "Off":
+                continue
+            if device.brightness != brightness:
+                rounds[1].append((device, LightBrightness(brightness), {"brightness": brightness}))
+            if colorTemInKelvin:
+                if device.colorTemInKelvin != colorTemInKelvin:
+                    rgbColor = {'r': 0, 'g': 0, 'b': 0}
+                    msg = ColorColorTemperature(rgbColor, colorTemInKelvin)
+                    rounds[2].append((device, msg, {"rgbColor": rgbColor, "colorTemInKelvin": colorTemInKelvin}))
+            else:
+                rgbColor = {'r': r, 'g': g, 'b': b}
+                if device.rgbColor != rgbColor or device.colorTemInKelvin:
+                    msg = ColorColorTemperature(rgbColor, 0)
+                    rounds[2].append((device, msg, {"rgbColor": rgbColor, "colorTemInKelvin": 0}))
+
+        sent = 0
+        interval = 0
+        for messages in rounds:
+            if not messages:
+                continue
+            if interval:
+                await aio.sleep(interval)
+            for device, msg, state in messages:
+                if device.send(msg):
+                    device.optimistic_update(**state)
+                    sent += 1
+            interval = max(1 / x[0].max_msg_rate for x in messages)
+        return sent
+
+    def transition(self, devices, target, duration, easing="linear"):
+        """Fade devices to a target state.
+        All the running transitions are driven by a single timer, a new transition on a device
+        replaces the running fade of the same attribute (brightness or color).
+            :param devices: Devices to transition
+            :type devices: list of aiogovee.Device or deviceId
+            :param target: Final state, any of brightness (0-100), rgb ({'r','g','b'}) or kelvin
+            :type target: dict
+            :param duration: Duration of the transition in seconds
+            :type duration: float
+            :param easing: "linear", "ease_in", "ease_out", "ease_in_out" or a callable
+            :type easing: str/callable
+            :returns: A future done when the transition is over
+            :rtype: asyncio.Future
+            :raises KeyError: If a deviceId is not known
+            :raises ValueError: If the target, duration or easing is not valid
+        """
+        devices = self.get_devices(devices)
+        return self.transitions.start(devices, target, duration, easing)
+
     def register(self, adevice):
         """Proxy method to register the device with the parent."""
         if self.parent:
@@ -406,6 +837,11 @@ class GoveeListener(aio.DatagramProtocol):
         if self.parent:
             self.parent.unregister(adevice)
 
+    def status_changed(self, adevice):
+        """Proxy method to tell the parent a device status changed, if it wants to know."""
+        if self.parent and hasattr(self.parent, "status_changed"):
+            self.parent.status_changed(adevice)
+
     def cleanup(self):
         """Method to call to cleanly terminate the connection to the device."""
         if self.transport:
@@ -414,6 +850,8 @@ class GoveeListener(aio.DatagramProtocol):
         if self.task:
             self.task.cancel()
             self.task = None
+        self.transitions.cleanup()
         for device in self.devices.values():
             device.cleanup()
+        self.tasks.cancel()
         self.devices = {}
@@ -0,0 +1,321 @@
+# gateway.py
+# Local gateway so many processes can share a single GoveeListener
+#
+# Clients connect to a Unix socket and/or a localhost TCP port and exchange JSON lines.
+# Each line is a request, or a list of requests that is answered with a list of responses:
+#
+#     {"id": 1, "method": "devices"}
+#     {"id": 2, "method": "status", "params": {"devices": ["71:2b:..."], "max_age": 5}}
+#     {"id": 3, "method": "command", "params": {"devices": ["71:2b:..."], "action": "brightness", "value": 50}}
+#     {"id": 4, "method": "transition", "params": {"devices": [...], "target": {"brightness": 0}, "duration": 10}}
+#     {"id": 5, "method": "subscribe"}
+#
+# Responses are {"id": ..., "result": ...} or {"id": ..., "error": "..."}, in the order of the requests.
+# The result of a command is {deviceId: true/false}, false when the device's message was not sent.
+# Requests don't wait for the devices, so a client can pipeline as many as it wants.
+# Subscribed clients also receive {"event": "register"/"unregister"/"status", "deviceId": ..., "state": {...}}
+
+import os
+import json
+import argparse
+import asyncio as aio
+
+from .aiogovee import GoveeListener, ON_VALUES, OFF_VALUES
+from .transition import EASINGS
+
+GATEWAY_HOST = "127.0.0.1"
+GATEWAY_PORT = 4010
+GATEWAY_LINE_LIMIT = 2 ** 20  # Longest request line (or batch of requests) accepted, in bytes
+MAX_CLIENT_BUFFER = 2 ** 20  # Events are not sent to subscribers with more than this many bytes not sent yet
+
+
+class GatewayError(Exception):
+    """Error reported to the client instead of a result"""
+
+
+class GoveeGateway(object):
+    """Run one GoveeListener and share its devices with local clients.
+    The gateway is the parent of its listener, devices are registered with it
+    and then with parent, if one is given.
+        :param loop: The asyncio loop being used
+        :type loop: asyncio.AbstractEventLoop
+        :param parent: Parent object to register/unregister discovered device
+        :type parent: object
+        :param path: Path of the Unix socket to listen to, None for no Unix socket
+        :type path: string
+        :param host: Address of the TCP server, None for no TCP server
+        :type host: string
+        :param port: Port of the TCP server
+        :type port: int
+        :param listener_kwargs: Parameters of the GoveeListener (listen_ip, discovery_interval...)
+        :type listener_kwargs: dict
+    """
+
+    def __init__(self, loop, parent=None, path=None, host=GATEWAY_HOST, port=GATEWAY_PORT, **listener_kwargs):
+        self.loop = loop
+        self.parent = parent
+        self.path = path
+        self.host = host
+        self.port = port
+        self.listener = GoveeListener(loop, parent=self, **listener_kwargs)
+        self.servers = []
+        self.clients = set()  # StreamWriters of the connected clients
+        self.subscribers = set()  # StreamWriters of the clients receiving events
+        self.methods = {
+            "devices": self.do_devices,
+            "status": self.do_status,
+            "command": self.do_command,
+            "transition": self.do_transition,
+        }
+
+    async def start(self):
+        """Start the listener and the servers"""
+        self.listener.start()
+        if self.path:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.servers.append(
+                await aio.start_unix_server(self.handle_client, path=self.path, limit=GATEWAY_LINE_LIMIT)
+            )
+        if self.host:
+            self.servers.append(
+                await aio.start_server(self.handle_client, self.host, self.port, limit=GATEWAY_LINE_LIMIT)
+            )
+
+    def cleanup(self):
+        """Method to call to cleanly stop the servers and the listener."""
+        for server in self.servers:
+            server.close()
+        self.servers = []
+        for writer in self.clients:
+            writer.close()
+        self.clients = set()
+        self.subscribers = set()
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+        self.listener.cleanup()
+
+    #
+    #                            Listener Parent Methods
+    #
+
+    def register(self, device):
+        self.publish("register", device)
+        if self.parent:
+            self.parent.register(device)
+
+    def unregister(self, device):
+        self.publish("unregister", device)
+        if self.parent:
+            self.parent.unregister(device)
+
+    def status_changed(self, device):
+        self.publish("status", device)
+        if self.parent and hasattr(self.parent, "status_changed"):
+            self.parent.status_changed(device)
+
+    def publish(self, event, device):
+        """Send an event to all the subscribers that keep up with them"""
+        if not self.subscribers:
+            return
+        line = json.dumps({"event": event, "deviceId": device.deviceId, "state": device.status()}).encode() + b"\n"
+        for writer in list(self.subscribers):
+            if writer.is_closing():
+                self.subscribers.discard(writer)
+            elif writer.transport.get_write_buffer_size() < MAX_CLIENT_BUFFER:
+                writer.write(line)
+
+    #
+    #                            Client Methods
+    #
+
+    async def handle_client(self, reader, writer):
+        """Serve the requests of a client until it disconnects"""
+        self.clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = {"id": None, "error": "Invalid JSON"}
+                else:
+                    if isinstance(request, list):
+                        response = [self.handle_request(x, writer) for x in request]
+                    else:
+                        response = self.handle_request(request, writer)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # ValueError is raised by readline when a line is longer than GATEWAY_LINE_LIMIT
+            pass
+        finally:
+            self.clients.discard(writer)
+            self.subscribers.discard(writer)
+            writer.close()
+
+    def handle_request(self, request, writer):
+        """Run a single request and return its response"""
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict):
+                raise GatewayError("A request must be an object")
+            method = request.get("method")
+            if method == "subscribe":
+                self.subscribers.add(writer)
+                result = True
+            elif method in self.methods:
+                params = request.get("params") or {}
+                if not isinstance(params, dict):
+                    raise GatewayError("params must be an object")
+                result = self.methods[method](params)
+            else:
+                raise GatewayError("Unknown method: {}".format(method))
+        except GatewayError as e:
+            return {"id": request_id, "error": str(e)}
+        except (KeyError, TypeError, ValueError) as e:
+            return {"id": request_id, "error": "Invalid params: {}".format(e)}
+        except Exception as e:
+            # Never let a request kill the connection and the rest of its batch
+            return {"id": request_id, "error": "{}: {}".format(type(e).__name__, e)}
+        return {"id": request_id, "result": result}
+
+    def get_devices(self, params):
+        """Devices selected by params["devices"], all the devices if missing"""
+        deviceIds = params.get("devices")
+        if deviceIds is None:
+            return list(self.listener.devices.values())
+        unknown = [x for x in deviceIds if x not in self.listener.devices]
+        if unknown:
+            raise GatewayError("Unknown devices: {}".format(", ".join(unknown)))
+        return [self.listener.devices[x] for x in deviceIds]
+
+    def do_devices(self, params):
+        return [
+            {"deviceId": x.deviceId, "sku": x.sku, "ip_addr": x.ip_addr, "registered": x.registered}
+            for x in self.listener.devices.values()
+        ]
+
+    def do_status(self, params):
+        max_age = params.get("max_age")
+        if max_age is not None and (isinstance(max_age, bool) or not isinstance(max_age, (int, float))):
+            raise GatewayError("Invalid max_age: {}".format(json.dumps(max_age)))
+        result = {}
+        for device in self.get_devices(params):
+            state = device.status(max_age)
+            state["pending"] = sorted(device.pending)
+            result[device.deviceId] = state
+        return result
+
+    def do_command(self, params):
+        action = params["action"]
+        value = params.get("value")
+        actions = {
+            "turn": lambda x: x.turn_onoff(value),
+            "brightness": lambda x: x.set_brightness(value),
+            "color": lambda x: x.set_rgbColor(value),
+            "colorTemperature": lambda x: x.set_colorTemperature(value),
+            "refresh": lambda x: x.refresh(),
+        }
+        if action not in actions:
+            raise GatewayError("Unknown action: {}".format(action))
+        check_value(action, value)
+        # False when the device's message was rejected (too many messages pending), or for
+        # refresh when no query was sent because one is already waiting for its response
+        return {x.deviceId: bool(actions[action](x)) for x in self.get_devices(params)}
+
+    def do_transition(self, params):
+        target = params["target"]
+        duration = params["duration"]
+        easing = params.get("easing", "linear")
+        check_transition(target, duration, easing)
+        devices = self.get_devices(params)
+        self.listener.transition(devices, target, duration, easing)
+        return len(devices)
+
+
+def is_int(value, low, high):
+    return isinstance(value, int) and not isinstance(value, bool) and low <= value <= high
+
+
+def check_value(action, value):
+    """Raise GatewayError if value is not valid for a command action"""
+    if action == "turn":
+        valid = isinstance(value, (bool, int, str)) and (value in ON_VALUES or value in OFF_VALUES)
+    elif action == "brightness":
+        valid = is_int(value, 0, 100)
+    elif action == "color":
+        valid = (
+            isinstance(value, dict)
+            and sorted(value) == ['b', 'g', 'r']
+            and all(is_int(x, 0, 255) for x in value.values())
+        )
+    elif action == "colorTemperature":
+        valid = is_int(value, 0, 9000)
+    else:
+        valid = True
+    if not valid:
+        raise GatewayError("Invalid value for {}: {}".format(action, json.dumps(value)))
+
+
+def check_transition(target, duration, easing):
+    """Raise GatewayError if a transition target, duration or easing is not valid"""
+    if not isinstance(target, dict):
+        raise GatewayError("Invalid target: {}".format(json.dumps(target)))
+    unknown = sorted(set(target) - {"brightness", "rgb", "kelvin"})
+    if unknown:
+        raise GatewayError("Unknown target fields: {}".format(", ".join(unknown)))
+    if not target:
+        raise GatewayError("A transition target needs brightness, rgb or kelvin")
+    if "rgb" in target and "kelvin" in target:
+        raise GatewayError("A transition target can not have both rgb and kelvin")
+    if "brightness" in target:
+        check_value("brightness", target["brightness"])
+    if "rgb" in target:
+        check_value("color", target["rgb"])
+    if "kelvin" in target:
+        check_value("colorTemperature", target["kelvin"])
+    if isinstance(duration, bool) or not isinstance(duration, (int, float)) or not 0 <= duration < float("inf"):
+        raise GatewayError("Invalid duration: {}".format(json.dumps(duration)))
+    if not isinstance(easing, str) or easing not in EASINGS:
+        raise GatewayError("Unknown easing: {}".format(json.dumps(easing)))
+
+
+def main():
+    """Run a gateway until interrupted."""
+    parser = argparse.ArgumentParser(description="Share a Govee listener with local clients.")
+    parser.add_argument("-s", "--socket", default=None, help="Path of the Unix socket to listen to.")
+    parser.add_argument("-p", "--port", type=int, default=GATEWAY_PORT, help="TCP port to listen to on localhost.")
+    parser.add_argument("--no-tcp", action="store_true", default=False, help="Don't listen to a TCP port.")
+    parser.add_argument("-i", "--listen-ip", default="0.0.0.0", help="IP of the network interface to run discovery on.")
+    parser.add_argument("-d", "--discovery-interval", type=int, default=180, help="Seconds between discoveries.")
+    opts = parser.parse_args()
+
+    async def amain():
+        gateway = GoveeGateway(
+            aio.get_event_loop(),
+            path=opts.socket,
+            host=None if opts.no_tcp else GATEWAY_HOST,
+            port=opts.port,
+            listen_ip=opts.listen_ip,
+            discovery_interval=opts.discovery_interval,
+        )
+        await gateway.start()
+        try:
+            while True:
+                await aio.sleep(3600)
+        finally:
+            gateway.cleanup()
+
+    try:
+        aio.run(amain())
+    except KeyboardInterrupt:
+        print("\nExiting at user's request.")
+
+
+if __name__ == "__main__":
+    main()
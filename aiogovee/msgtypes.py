@@ -25,6 +25,7 @@ class ScanResponse(Message):
         self,
         data,
     ):
+        check_types(data, {"device": str, "sku": str, "ip": str})
         self.deviceId = data["device"]
         self.sku = data["sku"]
         self.ip = data["ip"]
@@ -82,6 +83,8 @@ class DeviceStatusResponse(Message):
         self,
         data,
     ):
+        check_types(data, {"onOff": int, "brightness": int, "color": dict, "colorTemInKelvin": int})
+        check_types(data["color"], {"r": int, "g": int, "b": int})
         self.onOff = str_onoff(data["onOff"])
         self.brightness = data["brightness"]
         self.rgbColor = data["color"]
@@ -119,6 +122,16 @@ def datagram_to_govee_message(datagram):
     return govee_message
 
 
+def check_types(data, types):
+    """Raise ValueError if a field of data is missing or not of the expected type"""
+    if not isinstance(data, dict):
+        raise ValueError("Message data is not an object")
+    for field, field_type in types.items():
+        value = data.get(field)
+        if not isinstance(value, field_type) or isinstance(value, bool):
+            raise ValueError("Invalid {} in message: {!r}".format(field, value))
+
+
 ONOFF_MAP = {1: "On", 0: "Off"}
 
 def str_onoff(key):
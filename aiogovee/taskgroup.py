@@ -0,0 +1,93 @@
+# taskgroup.py
+# Tracking and bounded concurrency for the background work of aiogovee
+
+import asyncio as aio
+from collections import deque
+
+MAX_PENDING_TASKS = 1000  # How many tasks a group runs at once
+
+
+class TaskGroup(object):
+    """Owner of the tasks sent in the background (send_and_forget and the like).
+    Tasks are referenced until they are done, at most max_tasks run at once and they can
+    be cancelled all together or by owner (e.g. a Device) on cleanup.
+        :param loop: The asyncio loop being used
+        :type loop: asyncio.AbstractEventLoop
+        :param max_tasks: How many tasks can run at once
+        :type max_tasks: int
+    """
+
+    def __init__(self, loop, max_tasks=MAX_PENDING_TASKS):
+        self.loop = loop
+        self.max_tasks = max_tasks
+        self.tasks = {}  # Running tasks, their owner indexed by task
+        self.waiters = deque()  # Futures of the coroutines waiting to be admitted
+        self.rejected = 0  # Count of tasks rejected because the group was full
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def full(self):
+        return len(self.tasks) >= self.max_tasks
+
+    def spawn(self, coro, owner=None):
+        """Run coro as a task of the group, right away or not at all
+            :param coro: The coroutine to run
+            :type coro: coroutine
+            :param owner: Object the task belongs to, see cancel
+            :type owner: object
+            :returns: The task, None if the group is full
+            :rtype: asyncio.Task
+        """
+        if self.full():
+            coro.close()
+            self.rejected += 1
+            return None
+        task = self.loop.create_task(coro)
+        self.tasks[task] = owner
+        task.add_done_callback(self._task_done)
+        return task
+
+    async def submit(self, coro, owner=None):
+        """Wait until the group has room, then run coro as a task of the group
+            :param coro: The coroutine to run
+            :type coro: coroutine
+            :param owner: Object the task belongs to, see cancel
+            :type owner: object
+            :returns: The task
+            :rtype: asyncio.Task
+        """
+        waiter = None
+        try:
+            while self.full():
+                waiter = self.loop.create_future()
+                self.waiters.append(waiter)
+                await waiter
+        except aio.CancelledError:
+            coro.close()
+            if waiter is not None and waiter.done() and not waiter.cancelled() and not self.full():
+                # We were woken up but won't use the room, pass it on so it is not lost
+                self._wake()
+            raise
+        return self.spawn(coro, owner)
+
+    def _task_done(self, task):
+        self.tasks.pop(task, None)
+        self._wake()
+
+    def _wake(self):
+        """Wake up the first coroutine still waiting to be admitted"""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    def cancel(self, owner=None):
+        """Cancel the tasks of owner, all the tasks (and waiters) when owner is None"""
+        for task, task_owner in list(self.tasks.items()):
+            if owner is None or task_owner is owner:
+                task.cancel()
+        if owner is None:
+            while self.waiters:
+                self.waiters.popleft().cancel()
@@ -0,0 +1,328 @@
+# transition.py
+# Timed fades (brightness, color, color temperature) for groups of Govee devices
+
+from .msgtypes import LightBrightness, ColorColorTemperature
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, plain Python is used without it
+    np = None
+
+
+TRANSITION_TICK = 0.05  # How often, in seconds, the transition timer runs
+MAX_KELVIN = 9000  # Highest color temperature a transition accepts
+
+
+##### EASING FUNCTIONS #####
+# They all map progress 0.0-1.0 to 0.0-1.0 and work with floats and NumPy arrays alike
+
+
+def linear(x):
+    return x
+
+
+def ease_in(x):
+    return x * x
+
+
+def ease_out(x):
+    return x * (2 - x)
+
+
+def ease_in_out(x):
+    return x * x * (3 - 2 * x)
+
+
+EASINGS = {
+    "linear": linear,
+    "ease_in": ease_in,
+    "ease_out": ease_out,
+    "ease_in_out": ease_in_out,
+}
+
+
+def get_easing(easing):
+    """Return the easing function for a name, callables are returned as is"""
+    if callable(easing):
+        return easing
+    if easing not in EASINGS:
+        raise ValueError("Unknown easing: {}".format(easing))
+    return EASINGS[easing]
+
+
+def interpolate(starts, ends, progress, easings):
+    """Compute the intermediate value of every component in one pass
+        :param starts: Start value of each component
+        :type starts: list
+        :param ends: End value of each component
+        :type ends: list
+        :param progress: Progress (0.0-1.0) of each component
+        :type progress: list
+        :param easings: Easing function of each component
+        :type easings: list
+        :returns: The rounded intermediate values
+        :rtype: list of int
+    """
+    if np is not None:
+        s = np.asarray(starts, dtype=float)
+        e = np.asarray(ends, dtype=float)
+        p = np.clip(np.asarray(progress, dtype=float), 0.0, 1.0)
+        eased = np.empty_like(p)
+        for func in set(easings):
+            mask = np.fromiter((f is func for f in easings), dtype=bool, count=len(easings))
+            eased[mask] = func(p[mask])
+        return np.rint(s + (e - s) * eased).astype(int).tolist()
+
+    return [
+        int(round(s + (e - s) * f(min(max(p, 0.0), 1.0))))
+        for s, e, p, f in zip(starts, ends, progress, easings)
+    ]
+
+
+def _is_int(value, low, high):
+    return isinstance(value, int) and not isinstance(value, bool) and low <= value <= high
+
+
+def check_target(target, duration):
+    """Raise ValueError if a transition target or duration is not valid
+        :param target: Final state, any of brightness (0-100), rgb ({'r','g','b'} 0-255) or kelvin (0-9000)
+        :type target: dict
+        :param duration: Duration of the transition in seconds, 0 or more
+        :type duration: float
+    """
+    if not isinstance(target, dict):
+        raise ValueError("A transition target must be a dict")
+    brightness = target.get("brightness")
+    rgb = target.get("rgb")
+    kelvin = target.get("kelvin")
+    if rgb is not None and kelvin is not None:
+        raise ValueError("A transition target can not have both rgb and kelvin")
+    if brightness is None and rgb is None and kelvin is None:
+        raise ValueError("A transition target needs brightness, rgb or kelvin")
+    if brightness is not None and not _is_int(brightness, 0, 100):
+        raise ValueError("Invalid brightness: {!r}".format(brightness))
+    if rgb is not None and not (
+        isinstance(rgb, dict)
+        and sorted(rgb) == ['b', 'g', 'r']
+        and all(_is_int(x, 0, 255) for x in rgb.values())
+    ):
+        raise ValueError("Invalid rgb: {!r}".format(rgb))
+    if kelvin is not None and not _is_int(kelvin, 0, MAX_KELVIN):
+        raise ValueError("Invalid kelvin: {!r}".format(kelvin))
+    if isinstance(duration, bool) or not isinstance(duration, (int, float)) or not 0 <= duration < float("inf"):
+        raise ValueError("Invalid duration: {!r}".format(duration))
+
+
+class _Group(object):
+    """Book keeping for the future returned by TransitionEngine.start"""
+
+    def __init__(self, future):
+        self.future = future
+        self.pending = 0
+
+    def done(self):
+        self.pending -= 1
+        if self.pending <= 0 and not self.future.done():
+            self.future.set_result(None)
+
+
+class _Fade(object):
+    """A single attribute (brightness or color) fading on a single device"""
+
+    def __init__(self, group, device, kind, start, end, t0, duration, easing):
+        self.group = group
+        self.device = device
+        self.kind = kind  # "brightness", "rgb" or "kelvin"
+        self.start = start
+        self.end = end
+        self.t0 = t0
+        self.duration = duration
+        self.easing = easing
+        self.last = None  # Last value sent to the device
+        group.pending += 1
+
+    def progress(self, now):
+        if self.duration <= 0:
+            return 1.0
+        return (now - self.t0) / self.duration
+
+    def current(self):
+        """Value the device is currently at, as far as this fade knows"""
+        return self.last if self.last is not None else self.start
+
+    def send(self, value):
+        if self.kind == "brightness":
+            msg = LightBrightness(value[0])
+            state = {"brightness": value[0]}
+        elif self.kind == "rgb":
+            rgbColor = {'r': value[0], 'g': value[1], 'b': value[2]}
+            msg = ColorColorTemperature(rgbColor, 0)
+            state = {"rgbColor": rgbColor, "colorTemInKelvin": 0}
+        else:
+            rgbColor = {'r': 0, 'g': 0, 'b': 0}
+            msg = ColorColorTemperature(rgbColor, value[0])
+            state = {"rgbColor": rgbColor, "colorTemInKelvin": value[0]}
+        self.device.send(msg)
+        self.device.optimistic_update(**state)
+        self.last = value
+
+
+class TransitionEngine(object):
+    """Drive fades for any number of devices from a single timer.
+    Every tick, the next value of all the fades that are due is computed in one batch
+    (using NumPy when available). A device is only stepped as often as its message budget
+    (Device.max_msg_rate) allows, and a new transition on a device replaces the running
+    fade of the same attribute, starting from wherever that fade was.
+        :param loop: The asyncio loop being used
+        :type loop: asyncio.AbstractEventLoop
+        :param tick: How often, in seconds, the timer runs
+        :type tick: float
+    """
+
+    def __init__(self, loop, tick=TRANSITION_TICK):
+        self.loop = loop
+        self.tick = tick
+        self.fades = {}  # Running fades indexed by deviceId, then by "brightness"/"color"
+        self.next_step = {}  # Loop time when a device can be stepped again, indexed by deviceId
+        self.handle = None
+
+    def start(self, devices, target, duration, easing="linear"):
+        """Start a transition on devices
+            :param devices: Devices to transition
+            :type devices: list of aiogovee.Device
+            :param target: Final state, any of brightness (0-100), rgb ({'r','g','b'}) or kelvin
+            :type target: dict
+            :param duration: Duration of the transition in seconds
+            :type duration: float
+            :param easing: Name of a function in EASINGS or a callable
+            :type easing: str/callable
+            :returns: A future done when every fade of this transition ended or was replaced
+            :rtype: asyncio.Future
+            :raises ValueError: If the target, duration or easing is not valid
+        """
+        check_target(target, duration)
+        brightness = target.get("brightness")
+        rgb = target.get("rgb")
+        kelvin = target.get("kelvin")
+        easing = get_easing(easing)
+
+        group = _Group(self.loop.create_future())
+        now = self.loop.time()
+        for device in devices:
+            if brightness is not None:
+                self._add(group, device, "brightness", "brightness", (brightness,), now, duration, easing)
+            if rgb is not None:
+                self._add(group, device, "color", "rgb", (rgb['r'], rgb['g'], rgb['b']), now, duration, easing)
+            if kelvin is not None:
+                self._add(group, device, "color", "kelvin", (kelvin,), now, duration, easing)
+            self.next_step.setdefault(device.deviceId, now)
+
+        if group.pending:
+            self._schedule()
+        else:
+            group.future.set_result(None)
+        return group.future
+
+    def _add(self, group, device, slot, kind, end, now, duration, easing):
+        fades = self.fades.setdefault(device.deviceId, {})
+        previous = fades.get(slot)
+        if previous is not None and previous.kind == kind:
+            start = previous.current()
+        elif kind == "brightness" and device.brightness is not None:
+            start = (device.brightness,)
+        elif kind == "rgb" and device.rgbColor:
+            start = (device.rgbColor['r'], device.rgbColor['g'], device.rgbColor['b'])
+        elif kind == "kelvin" and device.colorTemInKelvin:
+            start = (device.colorTemInKelvin,)
+        else:
+            start = end  # Unknown current state, just go to the target
+        fade = _Fade(group, device, kind, start, end, now, duration, easing)
+        if previous is not None and previous.kind == kind:
+            fade.last = previous.last
+        fades[slot] = fade
+        if previous is not None:
+            previous.group.done()
+
+    def _schedule(self):
+        if self.handle is None:
+            self.handle = self.loop.call_later(self.tick, self._tick)
+
+    def _tick(self):
+        self.handle = None
+        now = self.loop.time()
+
+        due = []
+        for deviceId, fades in list(self.fades.items()):
+            for slot, fade in list(fades.items()):
+                if fade.group.future.cancelled():
+                    del fades[slot]
+            if not fades:
+                del self.fades[deviceId]
+                del self.next_step[deviceId]
+            elif self.next_step[deviceId] <= now:
+                device = next(iter(fades.values())).device
+                self.next_step[deviceId] = now + len(fades) / device.max_msg_rate
+                due.extend(fades.items())
+
+        if due:
+            starts, ends, progress, easings = [], [], [], []
+            for slot, fade in due:
+                p = fade.progress(now)
+                starts.extend(fade.start)
+                ends.extend(fade.end)
+                progress.extend([p] * len(fade.end))
+                easings.extend([fade.easing] * len(fade.end))
+            try:
+                values = interpolate(starts, ends, progress, easings)
+            except Exception:
+                values = None  # Find the failing fades one by one
+
+            idx = 0
+            for slot, fade in due:
+                n = len(fade.end)
+                try:
+                    if values is None:
+                        p = fade.progress(now)
+                        value = tuple(interpolate(fade.start, fade.end, [p] * n, [fade.easing] * n))
+                    else:
+                        value = tuple(values[idx:idx + n])
+                    if value != fade.last:
+                        fade.send(value)
+                except Exception as e:
+                    # A failing fade must not stop the fades of every other device
+                    self.loop.call_exception_handler({
+                        "message": "Transition of device {} failed".format(fade.device.deviceId),
+                        "exception": e,
+                    })
+                    self._remove(slot, fade)
+                else:
+                    if fade.progress(now) >= 1.0:
+                        self._remove(slot, fade)
+                idx += n
+
+        if self.fades:
+            self._schedule()
+
+    def _remove(self, slot, fade):
+        fades = self.fades.get(fade.device.deviceId, {})
+        if fades.get(slot) is fade:
+            del fades[slot]
+            if not fades:
+                del self.fades[fade.device.deviceId]
+                del self.next_step[fade.device.deviceId]
+        fade.group.done()
+
+    def cancel(self, devices=None):
+        """Stop the running fades of devices, all of them when devices is None"""
+        deviceIds = list(self.fades) if devices is None else [x.deviceId for x in devices]
+        for deviceId in deviceIds:
+            for fade in self.fades.pop(deviceId, {}).values():
+                fade.group.done()
+            self.next_step.pop(deviceId, None)
+
+    def cleanup(self):
+        """Method to call to cleanly stop the timer and all running fades."""
+        self.cancel()
+        if self.handle:
+            self.handle.cancel()
+            self.handle = None